@@ -1,33 +1,87 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, request, jsonify, send_from_directory
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
+import io
 import os
-import json
+import shutil
+import tempfile
 import uuid
 from datetime import datetime, timedelta
 import hashlib
+import hmac
 from config import Config
+import db
+
+class UploadRequest(Request):
+    # create_listing sends 7 form fields plus one file; keep the multipart
+    # parser from chewing through arbitrarily many parts
+    max_form_parts = 16
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        # Werkzeug spools file parts to disk past 500KB; typical listing
+        # images fit in RAM, so spool only past 8MB
+        return tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode='rb+')
 
 app = Flask(__name__)
 app.config.from_object(Config)
+app.request_class = UploadRequest
 CORS(app)
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# File to store listings data
-DATA_FILE = 'listings.json'
+# Extension set bound once instead of a config lookup per upload
+ALLOWED_EXTENSIONS = app.config['ALLOWED_EXTENSIONS']
+
+# Admin token hash, computed once at startup instead of per request
+ADMIN_TOKEN_HASH = hashlib.sha256(app.config['ADMIN_PASSWORD'].encode()).hexdigest()
+ADMIN_BEARER = f"Bearer {ADMIN_TOKEN_HASH}".encode()
 
-def init_data_file():
-    """Initialize the data file if it doesn't exist"""
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'w') as f:
-            json.dump([], f)
+def check_admin(auth):
+    """Constant-time check of the admin Authorization header"""
+    # Compare as bytes - compare_digest on str rejects non-ASCII input,
+    # which a client can always send in a header
+    return bool(auth) and hmac.compare_digest(auth.encode('latin-1'), ADMIN_BEARER)
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+    _, sep, ext = filename.rpartition('.')
+    return bool(sep) and ext.lower() in ALLOWED_EXTENSIONS
+
+def copy_upload_stream(src, out):
+    """Copy upload bytes kernel-side when the source is a real file, else in 1MB chunks"""
+    # Asking an unrolled SpooledTemporaryFile for its fileno would push it
+    # to disk - leave in-RAM uploads on the chunked path
+    if getattr(src, '_rolled', True):
+        try:
+            src_fd = src.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            src_fd = None
+    else:
+        src_fd = None
+
+    if src_fd is not None:
+        size = os.fstat(src_fd).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(out.fileno(), src_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+    else:
+        shutil.copyfileobj(src, out, length=1024 * 1024)
+
+def save_upload(file, filepath):
+    """Save an upload atomically - write to a temp file, then rename into place"""
+    fd, tmp = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            copy_upload_stream(file.stream, out)
+        os.replace(tmp, filepath)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
 
 def verify_payment(gift_card_number, card_name, amount):
     """Simulate payment verification - returns True/False and message"""
@@ -57,16 +111,11 @@ def verify_payment(gift_card_number, card_name, amount):
 @app.route('/api/listings', methods=['GET'])
 def get_listings():
     """Get all listings (public endpoint - shows only approved listings by default)"""
-    init_data_file()
-    with open(DATA_FILE, 'r') as f:
-        listings = json.load(f)
-    
     # For public view, only show approved listings
     approved_only = request.args.get('approved_only', 'true').lower() == 'true'
-    
-    if approved_only:
-        listings = [l for l in listings if l.get('status') == 'Approved']
-    
+
+    listings = db.get_listings(status='Approved' if approved_only else None)
+
     return jsonify(listings)
 
 @app.route('/api/listings/all', methods=['GET'])
@@ -75,14 +124,10 @@ def get_all_listings():
     auth = request.headers.get('Authorization')
     
     # Simple password check
-    if not auth or auth != f"Bearer {hashlib.sha256(app.config['ADMIN_PASSWORD'].encode()).hexdigest()}":
+    if not check_admin(auth):
         return jsonify({'error': 'Unauthorized'}), 401
-    
-    init_data_file()
-    with open(DATA_FILE, 'r') as f:
-        listings = json.load(f)
-    
-    return jsonify(listings)
+
+    return jsonify(db.get_listings())
 
 @app.route('/api/listings', methods=['POST'])
 def create_listing():
@@ -113,12 +158,20 @@ def create_listing():
         # Handle file upload
         image_url = None
         if file and allowed_file(file.filename):
-            filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            image_url = f"/uploads/{filename}"
+            # allowed_file has pinned the extension to the allow-list, so the
+            # stored name is just a random hex id plus that extension
+            ext = file.filename.rpartition('.')[2].lower()
+            filename = f"{uuid.uuid4().hex}.{ext}"
+            # Shard by the first two hex chars so no single directory
+            # accumulates an unbounded number of entries
+            subdir = filename[:2]
+            os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], subdir), exist_ok=True)
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], subdir, filename)
+            save_upload(file, filepath)
+            image_url = f"/uploads/{subdir}/{filename}"
         
         # Create listing object
+        now = datetime.now()
         listing = {
             'id': str(uuid.uuid4()),
             'full_name': data['full_name'],
@@ -133,20 +186,13 @@ def create_listing():
                 'verified': payment_valid
             },
             'status': 'Pending',
-            'created_at': datetime.now().isoformat(),
-            'verification_date': (datetime.now() + timedelta(days=1)).isoformat()
+            'created_at': now.isoformat(),
+            'verification_date': (now + timedelta(days=1)).isoformat()
         }
         
-        # Save to file
-        init_data_file()
-        with open(DATA_FILE, 'r') as f:
-            listings = json.load(f)
-        
-        listings.append(listing)
-        
-        with open(DATA_FILE, 'w') as f:
-            json.dump(listings, f, indent=2)
-        
+        # Save to database
+        db.insert_listing(listing)
+
         return jsonify({
             'message': 'Listing created successfully. It will be reviewed within 24 hours.',
             'listing': listing
@@ -161,54 +207,40 @@ def update_listing(listing_id):
     auth = request.headers.get('Authorization')
     
     # Simple password check
-    admin_hash = hashlib.sha256(app.config['ADMIN_PASSWORD'].encode()).hexdigest()
-    if not auth or auth != f"Bearer {admin_hash}":
+    if not check_admin(auth):
         return jsonify({'error': 'Unauthorized'}), 401
     
     data = request.json
     action = data.get('action')  # approve, reject, delete
-    
-    init_data_file()
-    with open(DATA_FILE, 'r') as f:
-        listings = json.load(f)
-    
-    # Find the listing
-    listing_index = None
-    for i, listing in enumerate(listings):
-        if listing['id'] == listing_id:
-            listing_index = i
-            break
-    
-    if listing_index is None:
-        return jsonify({'error': 'Listing not found'}), 404
-    
+
     if action == 'delete':
-        # Delete the listing
-        listing = listings.pop(listing_index)
-        
+        # Fetch first - the image path is needed for cleanup
+        listing = db.get_listing(listing_id)
+
+        if listing is None:
+            return jsonify({'error': 'Listing not found'}), 404
+
+        db.delete_listing(listing_id)
+
         # Delete associated image if exists
         if listing.get('image_url'):
             image_path = listing['image_url'].replace('/uploads/', '')
             full_path = os.path.join(app.config['UPLOAD_FOLDER'], image_path)
             if os.path.exists(full_path):
                 os.remove(full_path)
-        
+
         message = 'Listing deleted successfully'
+    elif action in ('approve', 'reject'):
+        # Single keyed UPDATE - no lookup needed first
+        status = 'Approved' if action == 'approve' else 'Rejected'
+
+        if not db.set_status(listing_id, status):
+            return jsonify({'error': 'Listing not found'}), 404
+
+        message = f'Listing {status.lower()} successfully'
     else:
-        # Update status
-        if action == 'approve':
-            listings[listing_index]['status'] = 'Approved'
-            message = 'Listing approved successfully'
-        elif action == 'reject':
-            listings[listing_index]['status'] = 'Rejected'
-            message = 'Listing rejected successfully'
-        else:
-            return jsonify({'error': 'Invalid action'}), 400
-    
-    # Save changes
-    with open(DATA_FILE, 'w') as f:
-        json.dump(listings, f, indent=2)
-    
+        return jsonify({'error': 'Invalid action'}), 400
+
     return jsonify({'message': message})
 
 @app.route('/api/admin/login', methods=['POST'])
@@ -216,13 +248,14 @@ def admin_login():
     """Admin login endpoint"""
     data = request.json
     password = data.get('password')
-    
-    if password == app.config['ADMIN_PASSWORD']:
-        # Generate simple token (in production, use JWT)
-        token = hashlib.sha256(f"{password}{datetime.now().isoformat()}".encode()).hexdigest()
+    if not isinstance(password, str):
+        password = ''
+
+    if hmac.compare_digest(password.encode(), app.config['ADMIN_PASSWORD'].encode()):
+        # Simple token (in production, use JWT)
         return jsonify({
             'success': True,
-            'token': hashlib.sha256(password.encode()).hexdigest(),
+            'token': ADMIN_TOKEN_HASH,
             'message': 'Login successful'
         })
     else:
@@ -231,7 +264,7 @@ def admin_login():
             'message': 'Invalid password'
         }), 401
 
-@app.route('/uploads/<filename>')
+@app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     """Serve uploaded files"""
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
@@ -239,21 +272,18 @@ def uploaded_file(filename):
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get listing statistics"""
-    init_data_file()
-    with open(DATA_FILE, 'r') as f:
-        listings = json.load(f)
-    
+    counts = db.get_status_counts()
+
     stats = {
-        'total': len(listings),
-        'pending': len([l for l in listings if l.get('status') == 'Pending']),
-        'approved': len([l for l in listings if l.get('status') == 'Approved']),
-        'rejected': len([l for l in listings if l.get('status') == 'Rejected'])
+        'total': sum(counts.values()),
+        'pending': counts.get('Pending', 0),
+        'approved': counts.get('Approved', 0),
+        'rejected': counts.get('Rejected', 0)
     }
-    
+
     return jsonify(stats)
 
 if __name__ == '__main__':
-    init_data_file()
     host="0.0.0.0"
     port = os.environ.get("PORT")
     app.run(debug=True, port=port, host=host)
@@ -5,4 +5,10 @@ class Config:
     ADMIN_PASSWORD = 'kennyray'
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi'}
\ No newline at end of file
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi'}
+    # Hand file responses to the front proxy (nginx/apache with
+    # mod_xsendfile) when one is configured to serve the uploads dir
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+    # Uploaded filenames are random UUIDs and never change, so let
+    # clients and CDNs cache them for a year
+    SEND_FILE_MAX_AGE_DEFAULT = 31536000
\ No newline at end of file
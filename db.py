@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+
+import orjson
+
+# SQLite database for listings
+DB_FILE = 'listings.db'
+
+# Old flat-file store, imported once on first run if present
+LEGACY_DATA_FILE = 'listings.json'
+
+_conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+
+# The connection is shared across request threads; writes take this lock so
+# concurrent POSTs/admin actions can't interleave inside a transaction
+_write_lock = threading.Lock()
+_conn.execute('PRAGMA journal_mode=WAL')
+_conn.execute('PRAGMA synchronous=NORMAL')
+_conn.execute('PRAGMA busy_timeout=5000')
+_conn.execute('PRAGMA cache_size=-64000')
+_conn.execute('PRAGMA mmap_size=134217728')  # read pages via mmap, up to 128MB
+_conn.execute('''
+    CREATE TABLE IF NOT EXISTS listings (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+''')
+_conn.execute('CREATE INDEX IF NOT EXISTS idx_status ON listings(status)')
+_conn.commit()
+
+def _dumps(listing):
+    """Serialize a listing payload compactly (orjson emits bytes, rows stay TEXT)"""
+    return orjson.dumps(listing).decode()
+
+def _migrate_legacy_file():
+    """Import listings from the old JSON flat file on first run"""
+    if not os.path.exists(LEGACY_DATA_FILE):
+        return
+
+    # Several workers import this module at the same time on first boot;
+    # whoever loses the race finds the file already renamed and stops
+    try:
+        count = _conn.execute('SELECT COUNT(*) FROM listings').fetchone()[0]
+        if count == 0:
+            with open(LEGACY_DATA_FILE, 'rb') as f:
+                legacy = orjson.loads(f.read())
+            with _write_lock, _conn:
+                for listing in legacy:
+                    _conn.execute(
+                        'INSERT OR IGNORE INTO listings (id, status, payload, created_at) VALUES (?, ?, ?, ?)',
+                        (listing['id'], listing.get('status', 'Pending'),
+                         _dumps(listing), listing.get('created_at', ''))
+                    )
+
+        os.rename(LEGACY_DATA_FILE, LEGACY_DATA_FILE + '.bak')
+    except FileNotFoundError:
+        pass
+
+_migrate_legacy_file()
+
+# Parsed listings cached per database generation so repeated reads skip
+# the query and JSON parsing until something actually changes, plus a
+# per-status index so filtered reads don't rescan the list
+_cache = {'generation': None, 'listings': None, 'by_status': None}
+
+def _generation():
+    """Current database generation - changes on any write, ours or another process's"""
+    data_version = _conn.execute('PRAGMA data_version').fetchone()[0]
+    return (data_version, _conn.total_changes)
+
+def load_listings():
+    """Get all listings, reusing the cached parse while the database is unchanged"""
+    generation = _generation()
+    if generation != _cache['generation']:
+        rows = _conn.execute(
+            'SELECT payload FROM listings ORDER BY created_at'
+        ).fetchall()
+        listings = [orjson.loads(row[0]) for row in rows]
+        by_status = defaultdict(list)
+        for listing in listings:
+            by_status[listing.get('status')].append(listing)
+        _cache['listings'] = listings
+        _cache['by_status'] = by_status
+        _cache['generation'] = generation
+    return _cache['listings']
+
+def get_listings(status=None):
+    """Get all listings, optionally filtered by status"""
+    listings = load_listings()
+    if status:
+        return _cache['by_status'].get(status, [])
+    return listings
+
+def get_listing(listing_id):
+    """Get a single listing by id, or None if it doesn't exist"""
+    row = _conn.execute(
+        'SELECT payload FROM listings WHERE id = ?', (listing_id,)
+    ).fetchone()
+    return orjson.loads(row[0]) if row else None
+
+def insert_listing(listing):
+    """Insert a new listing"""
+    with _write_lock, _conn:
+        _conn.execute(
+            'INSERT INTO listings (id, status, payload, created_at) VALUES (?, ?, ?, ?)',
+            (listing['id'], listing['status'], _dumps(listing), listing['created_at'])
+        )
+
+def set_status(listing_id, status):
+    """Update a listing's status. Returns True if the listing existed"""
+    with _write_lock, _conn:
+        cur = _conn.execute(
+            "UPDATE listings SET status = ?, payload = json_set(payload, '$.status', ?) WHERE id = ?",
+            (status, status, listing_id)
+        )
+    return cur.rowcount > 0
+
+def delete_listing(listing_id):
+    """Delete a listing. Returns True if the listing existed"""
+    with _write_lock, _conn:
+        cur = _conn.execute('DELETE FROM listings WHERE id = ?', (listing_id,))
+    return cur.rowcount > 0
+
+def get_status_counts():
+    """Get listing counts grouped by status in a single pass over the cached listings"""
+    return Counter(l.get('status') for l in load_listings())